@@ -1,8 +1,10 @@
-import io
 import string
+from collections.abc import Sequence
 from dataclasses import dataclass
+from functools import cache
 from math import comb
-from typing import Any, Optional, Union
+from types import MappingProxyType
+from typing import Any, Optional
 
 from hypothesis.strategies import (
     booleans,
@@ -24,6 +26,10 @@ from hypothesis_vcf.utils import str_is_int
 
 ALPHANUMERIC = string.ascii_lowercase + string.ascii_uppercase + string.digits
 
+_ALPHANUMERIC_TEXT = text(alphabet=ALPHANUMERIC, min_size=1)
+_ALPHANUMERIC_CHAR = text(alphabet=ALPHANUMERIC, min_size=1, max_size=1)
+_BASES = text("ACGTN", min_size=1)
+
 
 @dataclass(frozen=True)
 class Field:
@@ -44,7 +50,8 @@ class Field:
 
 
 # GT is a special case, since it has a special syntax, and must be listed as the first
-# format field (if present)
+# format field (if present). This instance is the only GT field generated, so it is
+# checked for by identity (`field is GT`) rather than by dataclass equality.
 GT = Field(
     category="FORMAT",
     vcf_key="GT",
@@ -100,26 +107,34 @@ RESERVED_FORMAT_KEYS = [
     "PS",
 ]
 
+RESERVED_INFO_KEYS_SET = frozenset(RESERVED_INFO_KEYS)
+RESERVED_FORMAT_KEYS_SET = frozenset(RESERVED_FORMAT_KEYS)
+
 # [1.4.2 Information field format]
 # [1.4.4 Individual format field format]
 
+# [1.6.1 Fixed fields]
+_FIELD_KEY_STRATEGY = from_regex(r"[A-Za-z_][0-9A-Za-z_.]", fullmatch=True)
+
 
+@cache
 def vcf_field_keys(category):
     # exclude reserved keys because generated type and number may not match spec
-    # [1.6.1 Fixed fields]
-    field_key_regex = r"[A-Za-z_][0-9A-Za-z_.]"
+    # 'id' is reserved since it conflicts with 'variant_id' variable in VCF Zarr
+    if category == "INFO":
+        reserved_keys = RESERVED_INFO_KEYS_SET
+    elif category == "FORMAT":
+        reserved_keys = RESERVED_FORMAT_KEYS_SET
+    else:
+        reserved_keys = frozenset()
 
-    def is_reserved_key(key):
-        # 'id' is reserved since it conflicts with 'variant_id' variable in VCF Zarr
-        return (
-            category == "INFO" and key in RESERVED_INFO_KEYS or key.lower() == "id"
-        ) or (category == "FORMAT" and key in RESERVED_FORMAT_KEYS)
+    def is_not_reserved_key(key):
+        return key not in reserved_keys and key.lower() != "id"
 
-    return from_regex(field_key_regex, fullmatch=True).filter(
-        lambda key: not is_reserved_key(key)
-    )
+    return _FIELD_KEY_STRATEGY.filter(is_not_reserved_key)
 
 
+@cache
 def vcf_types(category):
     if category == "INFO":
         return sampled_from(["Integer", "Float", "Flag", "Character", "String"])
@@ -129,31 +144,36 @@ def vcf_types(category):
     raise ValueError(f"Category '{category}' is not supported.")
 
 
+@cache
 def vcf_numbers(category, max_number):
+    # numbers for non-flag fields, which can't have number 0
+    # (flag fields always have number 0)
     if category == "INFO":
         # info fields can't have number G
-        return one_of(integers(0, max_number).map(str), sampled_from(["A", "R", "."]))
+        return one_of(integers(1, max_number).map(str), sampled_from(["A", "R", "."]))
     elif category == "FORMAT":
-        # format fields can't have number 0 (flag type)
         return one_of(
             integers(1, max_number).map(str), sampled_from(["A", "R", "G", "."])
         )
     raise ValueError(f"Category '{category}' is not supported.")
 
 
-def vcf_fields(category, max_number):
+@composite
+def general_vcf_fields(draw, category, max_number):
+    vcf_key = draw(vcf_field_keys(category))
+    vcf_type = draw(vcf_types(category))
     # info flag fields must have number 0
     # non-flag fields can't have number 0
-    general_fields = builds(
-        Field,
-        category=just(category),
-        vcf_key=vcf_field_keys(category),
-        vcf_type=vcf_types(category),
-        vcf_number=vcf_numbers(category, max_number),
-    ).filter(
-        lambda field: (field.vcf_type == "Flag" and field.vcf_number == "0")
-        or (field.vcf_type != "Flag" and field.vcf_number != "0")
-    )
+    if vcf_type == "Flag":
+        vcf_number = "0"
+    else:
+        vcf_number = draw(vcf_numbers(category, max_number))
+    return Field(category, vcf_key, vcf_type, vcf_number)
+
+
+@cache
+def vcf_fields(category, max_number):
+    general_fields = general_vcf_fields(category, max_number)
     if category == "INFO":
         return general_fields
     else:
@@ -163,13 +183,16 @@ def vcf_fields(category, max_number):
 
 # [1.6.1 Fixed fields]
 
+# [1.4.7 Contig field format]
+# Note that this *doesn't* include an initial hash character (#) since it causes
+# problems with tabix indexing, since # is treated as a comment character.
+_CONTIG_STRATEGY = from_regex(
+    r"[0-9A-Za-z!$%&+./:;?@^_|~-][0-9A-Za-z!#$%&*+./:;=?@^_|~-]*", fullmatch=True
+)
+
 
 def contigs():
-    # [1.4.7 Contig field format]
-    # Note that this *doesn't* include an initial hash character (#) since it causes
-    # problems with tabix indexing, since # is treated as a comment character.
-    contig_regex = r"[0-9A-Za-z!$%&+./:;?@^_|~-][0-9A-Za-z!#$%&*+./:;=?@^_|~-]*"
-    return from_regex(contig_regex, fullmatch=True)
+    return _CONTIG_STRATEGY
 
 
 def positions(min_pos=0, max_pos=2**31 - 1):
@@ -179,11 +202,11 @@ def positions(min_pos=0, max_pos=2**31 - 1):
 def ids():
     # currently restricted to alphanumeric, although the spec doesn't have that
     # limitation
-    return one_of(none(), text(alphabet=ALPHANUMERIC, min_size=1))
+    return one_of(none(), _ALPHANUMERIC_TEXT)
 
 
 def bases():
-    return text("ACGTN", min_size=1)
+    return _BASES
 
 
 def qualities():
@@ -206,7 +229,7 @@ def genotypes(alleles, ploidy):
     def gt_str(allele_indexes, phased):
         sep = "|" if phased else "/"
         return sep.join(
-            [str(idx) if idx is not None else "." for idx in allele_indexes]
+            [f"{idx}" if idx is not None else "." for idx in allele_indexes]
         )
 
     return builds(
@@ -218,65 +241,113 @@ def genotypes(alleles, ploidy):
     )
 
 
-@composite
-def vcf_values(draw, field, *, max_number, alt_alleles, ploidy):
+# [1.3 Data types]
+# each value may be missing, so these include None
+_TYPE_VALUE_STRATEGIES = {
+    # some integer values at lower end of range are not allowed
+    "Integer": one_of(integers(-(2**31) + 8, 2**31 - 1), none()),
+    # in general inf and nan are allowed
+    "Float": one_of(floats(width=32), none()),
+    # currently restricted to alphanumeric
+    "Character": one_of(_ALPHANUMERIC_CHAR, none()),
+    # currently restricted to alphanumeric
+    "String": one_of(_ALPHANUMERIC_TEXT, none()),
+}
+
+
+def vcf_values(field, *, max_number, alt_alleles, ploidy):
     # GT special case
+    # Note that vcf() doesn't reach this branch: variant_values draws GT values
+    # straight from genotypes() for all samples at once, so keep the two in sync.
     if field is GT:
-        return [draw(genotypes(alleles=alt_alleles + 1, ploidy=ploidy))]
-
-    # [1.3 Data types]
-    if field.vcf_type == "Integer":
-        # some integer values at lower end of range are not allowed
-        values = integers(-(2**31) + 8, 2**31 - 1)
-    elif field.vcf_type == "Float":
-        # in general inf and nan are allowed
-        values = floats(width=32)
-    elif field.vcf_type == "Flag":
+        return genotypes(alleles=alt_alleles + 1, ploidy=ploidy).map(lambda gt: [gt])
+
+    if field.vcf_type == "Flag":
         # note this returns a bool not a list
-        return draw(booleans())
-    elif field.vcf_type == "Character":
-        # currently restricted to alphanumeric
-        values = text(alphabet=ALPHANUMERIC, min_size=1, max_size=1)
-    elif field.vcf_type == "String":
-        # currently restricted to alphanumeric
-        values = text(alphabet=ALPHANUMERIC, min_size=1)
-    else:
-        raise ValueError(f"Type '{field.vcf_type}' is not supported.")
-
-    number = draw(
-        vcf_number_to_ints(
-            field.vcf_number,
-            max_number=max_number,
-            alt_alleles=alt_alleles,
-            ploidy=ploidy,
-        )
+        return booleans()
+    try:
+        values = _TYPE_VALUE_STRATEGIES[field.vcf_type]
+    except KeyError:
+        raise ValueError(f"Type '{field.vcf_type}' is not supported.") from None
+
+    number = vcf_number_to_ints(
+        field.vcf_number,
+        max_number=max_number,
+        alt_alleles=alt_alleles,
+        ploidy=ploidy,
     )
-    return draw(lists(one_of(values, none()), min_size=number, max_size=number))
+    return number.flatmap(lambda n: lists(values, min_size=n, max_size=n))
 
 
-def vcf_number_to_ints(vcf_number, *, max_number, alt_alleles, ploidy):
+def genotype_count(n_alleles, ploidy):
+    # number of distinct unphased genotypes
+    return comb(n_alleles + ploidy - 1, ploidy)
+
+
+@cache
+def vcf_number_strategies(max_number, alt_alleles, ploidy):
     # [1.4.2 Information field format]
-    if vcf_number == ".":
-        return integers(1, max_number)
+    n_alleles = alt_alleles + 1
+    strategies = {str(i): just(i) for i in range(max_number + 1)}
+    strategies["."] = integers(1, max_number)
+    strategies["A"] = just(alt_alleles)
+    strategies["R"] = just(n_alleles)
+    strategies["G"] = just(genotype_count(n_alleles, ploidy))
+    # read-only, since the table is shared between callers
+    return MappingProxyType(strategies)
+
+
+def vcf_number_to_ints(vcf_number, *, max_number, alt_alleles, ploidy):
+    strategies = vcf_number_strategies(max_number, alt_alleles, ploidy)
+    if vcf_number in strategies:
+        return strategies[vcf_number]
     elif str_is_int(vcf_number):
+        # integral numbers larger than max_number
         return just(int(vcf_number))
-    elif vcf_number == "A":
-        return just(alt_alleles)
-    elif vcf_number == "R":
-        return just(alt_alleles + 1)
-    elif vcf_number == "G":
-        n_alleles = alt_alleles + 1
-        return just(comb(n_alleles + ploidy - 1, ploidy))
     raise ValueError(f"Number '{vcf_number}' is not supported.")
 
 
-def ensure_gt_first(format_fields):
+def ensure_gt_first(format_fields: list[Field]) -> None:
     # GT must be the first field if present [1.6.2 Genotype fields]
-    try:
-        i = format_fields.index(GT)
-        format_fields.insert(0, format_fields.pop(i))
-    except ValueError:
-        pass
+    for i, field in enumerate(format_fields):
+        if field is GT:
+            if i != 0:
+                format_fields[0], format_fields[i] = format_fields[i], format_fields[0]
+            return
+
+
+@composite
+def variant_values(
+    draw, info_fields, format_fields, *, n_samples, max_alt_alleles, max_number
+):
+    ref = draw(bases())
+    alt = draw(lists(bases(), max_size=max_alt_alleles))
+    qual = draw(qualities())
+    info_values = [
+        draw(vcf_values(field, max_number=max_number, alt_alleles=len(alt), ploidy=2))
+        for field in info_fields
+    ]
+    format_values = []
+    for field in format_fields:
+        if field is GT:
+            # draw genotype strings directly rather than via vcf_values, matching
+            # its GT branch
+            gts = draw(
+                lists(
+                    genotypes(alleles=len(alt) + 1, ploidy=2),
+                    min_size=n_samples,
+                    max_size=n_samples,
+                )
+            )
+            format_values.append([[gt] for gt in gts])
+        else:
+            values = vcf_values(
+                field, max_number=max_number, alt_alleles=len(alt), ploidy=2
+            )
+            format_values.append(
+                draw(lists(values, min_size=n_samples, max_size=n_samples))
+            )
+    return ref, alt, qual, info_values, format_values
 
 
 @composite
@@ -339,11 +410,7 @@ def vcf(
         )
     )
     ensure_gt_first(format_fields)
-    sample_ids = draw(
-        lists(
-            text(alphabet=ALPHANUMERIC, min_size=1), max_size=max_samples, unique=True
-        )
-    )
+    sample_ids = draw(lists(_ALPHANUMERIC_TEXT, max_size=max_samples, unique=True))
     variant_ids = draw(lists(ids(), min_size=1, max_size=max_variants, unique=True))
 
     contig = draw(contigs())  # currently just a single contig
@@ -358,146 +425,132 @@ def vcf(
     )
     variant_positions.sort()
 
-    output = io.StringIO()
-    print(
-        vcf_header_string([contig], info_fields, format_fields, sample_ids),
-        end="",
-        file=output,
+    output = [vcf_header_string([contig], info_fields, format_fields, sample_ids)]
+
+    variants = draw(
+        lists(
+            variant_values(
+                info_fields,
+                format_fields,
+                n_samples=len(sample_ids),
+                max_alt_alleles=max_alt_alleles,
+                max_number=max_number,
+            ),
+            min_size=len(variant_ids),
+            max_size=len(variant_ids),
+        )
     )
 
-    for contig, pos, id_ in zip(variant_contigs, variant_positions, variant_ids):
-        ref = draw(bases())
-        alt = draw(lists(bases(), max_size=max_alt_alleles))
-        qual = draw(qualities())
+    for contig, pos, id_, (ref, alt, qual, all_info_values, all_format_values) in zip(
+        variant_contigs, variant_positions, variant_ids, variants
+    ):
         filter_ = None
         info = []
-        for field in info_fields:
-            info_values = draw(
-                vcf_values(field, max_number=max_number, alt_alleles=len(alt), ploidy=2)
-            )
-            if not is_missing(info_values):
-                if info_values is True:
-                    info.append(field.vcf_key)
-                else:
-                    text_values = ["." if v is None else str(v) for v in info_values]
-                    info.append(f'{field.vcf_key}={join(",", text_values)}')
+        for field, info_values in zip(info_fields, all_info_values):
+            if info_values is True:
+                info.append(field.vcf_key)
+            elif info_values is not False and not _is_missing_list(info_values):
+                info.append(f"{field.vcf_key}={render_values(info_values)}")
         format_ = []
         sample_values = [[] for _ in range(len(sample_ids))]
-        for field in format_fields:
-            sample_values_for_field = [
-                draw(
-                    vcf_values(
-                        field, max_number=max_number, alt_alleles=len(alt), ploidy=2
-                    )
-                )
-                for _ in range(len(sample_ids))
-            ]
-            if all(is_missing(v) for v in sample_values_for_field):
+        for field, sample_values_for_field in zip(format_fields, all_format_values):
+            for sv in sample_values_for_field:
+                if not _is_missing_list(sv):
+                    break
+            else:
                 continue
             format_.append(field.vcf_key)
             for sv, sv2 in zip(sample_values_for_field, sample_values):
-                text_values = ["." if v is None else str(v) for v in sv]
-                sv2.append(join(",", text_values))
+                sv2.append(render_values(sv))
 
-        variant = vcf_variant_string(
-            contig, pos, id_, ref, alt, qual, filter_, info, format_, sample_values
+        output.append(
+            vcf_variant_string(
+                contig, pos, id_, ref, alt, qual, filter_, info, format_, sample_values
+            )
         )
-        print(str(variant), end="", file=output)
 
-    return output.getvalue()
+    return "".join(output)
 
 
 # Formatting
 
 
-def is_missing(val: Union[bool, list[Any]]) -> bool:
-    if isinstance(val, bool):
-        return val is False
-    if len(val) == 0:
-        return True
-    return all(v is None for v in val)
+def _is_missing_list(val: Sequence[Any]) -> bool:
+    # Flag values are bools and must be checked by the caller
+    return val.count(None) == len(val)
 
 
-def join(separator: str, vals: Optional[list[str]]) -> str:
+def join(separator: str, vals: Optional[Sequence[str]]) -> str:
+    # values are never empty strings, so only an empty sequence renders as missing
     if vals is None or len(vals) == 0:
         return "."
-    res = separator.join(vals)
-    if len(res) == 0:
+    return separator.join(vals)
+
+
+def render_values(vals: Sequence[Any]) -> str:
+    if len(vals) == 0:
         return "."
-    return res
+    if None in vals:
+        return ",".join(["." if v is None else f"{v}" for v in vals])
+    return ",".join(map(str, vals))
 
 
-def vcf_header_string(contigs, info_fields, format_fields, sample_ids):
-    output = io.StringIO()
+def vcf_header_string(
+    contigs: list[str],
+    info_fields: list[Field],
+    format_fields: list[Field],
+    sample_ids: list[str],
+) -> str:
+    lines: list[str] = []
 
     # [1.4.1 File format]
-    print("##fileformat=VCFv4.3", file=output)
+    lines.append("##fileformat=VCFv4.3\n")
 
     # [1.4.3 Filter field format]
-    print('##FILTER=<ID=PASS,Description="All filters passed">', file=output)
+    lines.append('##FILTER=<ID=PASS,Description="All filters passed">\n')
 
-    print(f"##source=hypothesis-vcf-{hypothesis_vcf.__version__}", file=output)
+    lines.append(f"##source=hypothesis-vcf-{hypothesis_vcf.__version__}\n")
 
     # [1.4.7 Contig field format]
     for contig in contigs:
-        print(f"##contig=<ID={contig}>", file=output)
+        lines.append(f"##contig=<ID={contig}>\n")
 
     # [1.4.2 Information field format]
     for field in info_fields:
-        print(field.get_header(), file=output)
+        lines.append(f"{field.get_header()}\n")
 
     # [1.4.4 Individual format field format]
     for field in format_fields:
-        print(field.get_header(), file=output)
+        lines.append(f"{field.get_header()}\n")
 
     # [1.5 Header line syntax]
-    print(
-        "#CHROM",
-        "POS",
-        "ID",
-        "REF",
-        "ALT",
-        "QUAL",
-        "FILTER",
-        "INFO",
-        sep="\t",
-        end="",
-        file=output,
-    )
-
+    header = ["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO"]
     if len(sample_ids) > 0:
-        print(end="\t", file=output)
-        print("FORMAT", *sample_ids, sep="\t", file=output)
-    else:
-        print(file=output)
+        header.append("FORMAT")
+        header.extend(sample_ids)
+    lines.append("\t".join(header) + "\n")
 
-    return output.getvalue()
+    return "".join(lines)
 
 
 def vcf_variant_string(
-    contig, pos, id_, ref, alt, qual, filter_, info, format_, sample_values
-):
-    output = io.StringIO()
-
-    print(
-        contig,
-        pos,
-        "." if id_ is None else id_,
-        ref,
-        join(",", alt),
-        "." if qual is None else str(qual),
-        join(";", filter_),
-        join(";", info),
-        sep="\t",
-        end="",
-        file=output,
+    contig: str,
+    pos: int,
+    id_: Optional[str],
+    ref: str,
+    alt: list[str],
+    qual: Optional[float],
+    filter_: Optional[list[str]],
+    info: list[str],
+    format_: list[str],
+    sample_values: list[list[str]],
+) -> str:
+    fixed = (
+        f"{contig}\t{pos}\t{'.' if id_ is None else id_}\t{ref}\t{join(',', alt)}\t"
+        f"{'.' if qual is None else qual}\t{join(';', filter_)}\t"
+        f"{join(';', info)}"
     )
-    if len(sample_values) > 0:
-        print(end="\t", file=output)
-        format_str = join(":", format_)
-        sample_strs = [join(":", sv) for sv in sample_values]
-        print(format_str, *sample_strs, sep="\t", end="\n", file=output)
-    else:
-        print(file=output)
-
-    return output.getvalue()
+    if len(sample_values) == 0:
+        return f"{fixed}\n"
+    samples = "\t".join([join(":", sv) for sv in sample_values])
+    return f"{fixed}\t{join(':', format_)}\t{samples}\n"
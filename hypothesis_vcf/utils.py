@@ -1,7 +1,4 @@
 def str_is_int(x: str) -> bool:
-    """Test if a string can be parsed as an int"""
-    try:
-        int(x)
-        return True
-    except ValueError:
-        return False
+    """Test if a string is an optionally negative run of decimal digits"""
+    s = x[1:] if x[:1] == "-" else x
+    return s.isdecimal()
@@ -2,16 +2,20 @@ import re
 
 import pysam
 from hypothesis import HealthCheck, given, note, settings
-from hypothesis.strategies import data
+from hypothesis.strategies import data, lists
 
 from hypothesis_vcf import vcf
 from hypothesis_vcf.strategies import (
+    GT,
     RESERVED_FORMAT_KEYS,
     RESERVED_INFO_KEYS,
     Field,
+    ensure_gt_first,
     genotypes,
+    render_values,
     vcf_field_keys,
     vcf_fields,
+    vcf_number_to_ints,
     vcf_values,
 )
 
@@ -43,6 +47,21 @@ def test_format_fields(data):
     assert field.vcf_number != "0"
 
 
+@given(data=data())
+def test_format_fields_gt_first(data):
+    fields = data.draw(
+        lists(
+            vcf_fields("FORMAT", max_number=3),
+            unique_by=lambda f: f.vcf_key.lower(),
+        )
+    )
+    ensure_gt_first(fields)
+    gt_indexes = [i for i, field in enumerate(fields) if field.vcf_key == "GT"]
+    assert gt_indexes in ([], [0])
+    if gt_indexes:
+        assert fields[0] is GT
+
+
 @given(data=data())
 def test_genotypes(data):
     alleles = 3
@@ -63,6 +82,26 @@ def test_vcf_values(data):
     assert values[0] is None or isinstance(values[0], int)
 
 
+@given(data=data())
+def test_vcf_number_to_ints(data):
+    kwargs = dict(max_number=3, alt_alleles=2, ploidy=2)
+    assert data.draw(vcf_number_to_ints("0", **kwargs)) == 0
+    assert data.draw(vcf_number_to_ints("2", **kwargs)) == 2
+    assert data.draw(vcf_number_to_ints("5", **kwargs)) == 5
+    assert data.draw(vcf_number_to_ints("A", **kwargs)) == 2
+    assert data.draw(vcf_number_to_ints("R", **kwargs)) == 3
+    assert data.draw(vcf_number_to_ints("G", **kwargs)) == 6
+    assert 1 <= data.draw(vcf_number_to_ints(".", **kwargs)) <= 3
+
+
+def test_render_values():
+    assert render_values([]) == "."
+    assert render_values([None]) == "."
+    assert render_values([1, None, 2.5]) == "1,.,2.5"
+    assert render_values(["a", "b"]) == "a,b"
+    assert render_values(("a", None)) == "a,."
+
+
 # simple test from README
 @given(vcf_string=vcf())
 def test_vcf(vcf_string):
@@ -0,0 +1,20 @@
+import pytest
+
+from hypothesis_vcf.utils import str_is_int
+
+
+@pytest.mark.parametrize(
+    ("x", "expected"),
+    [
+        ("0", True),
+        ("12", True),
+        ("-3", True),
+        ("", False),
+        ("-", False),
+        (".", False),
+        ("A", False),
+        ("1.5", False),
+    ],
+)
+def test_str_is_int(x, expected):
+    assert str_is_int(x) is expected